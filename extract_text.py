@@ -1,36 +1,51 @@
 import fitz  # PyMuPDF
+import hashlib
+import multiprocessing
 import os
 import re
 
 INPUT_FOLDER = "data/corpus"
 OUTPUT_FOLDER = "data/extracted"
 
+# Caché del texto extraído, indexada por ruta, fecha de modificación y tamaño de cada PDF:
+# si el PDF no cambia, no se vuelve a extraer (borrar la carpeta para forzarlo)
+CACHE_FOLDER = "data/.cache/extracted"
+USE_CACHE = True
+# Incrementar si cambia la limpieza del texto, para invalidar la caché
+EXTRACTION_VERSION = 1
+
+# Número máximo de procesos: a partir de 4-6 workers PyMuPDF deja de escalar
+MAX_WORKERS = 6
+# Reciclamos cada worker tras unos cuantos PDFs para liberar las cachés de MuPDF
+MAX_TASKS_PER_CHILD = 8
+
+# Líneas completas (con su salto de línea) que contienen marcas de firma/CSV/validación
+SIGNATURE_LINE_RE = re.compile(
+    r"(?m)^.*(?:CSV : GEN-|DIRECCIÓN DE VALIDACIÓN|FIRMANTE\(|FECHA :|NOTAS :).*\n?"
+)
+
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
 
 def clean_paragraph(paragraph: str) -> str:
     """
     Limpia un párrafo uniendo líneas y eliminando saltos innecesarios.
     """
-    lines = paragraph.split("\n")
-    result = ""
-    for line in lines:
+    parts = []
+    for line in paragraph.split("\n"):
         line = line.strip()
         if not line:
             continue
 
         # Si hay un guion al final (corte de palabra), lo quitamos.
-        if line.endswith("-"):
+        if line[-1] == "-":
             line = line[:-1]
+            if not line:
+                continue
 
-        if result:
-            if not result.endswith((".", ":", ";", "?", "¡", "!", "¿")):
-                result += " " + line
-            else:
-                result += " " + line
-        else:
-            result = line
+        parts.append(line)
 
-    return result
+    return " ".join(parts)
 
 
 def remove_signature_lines(text: str) -> str:
@@ -38,24 +53,8 @@ def remove_signature_lines(text: str) -> str:
     Elimina todas las líneas que contengan referencias de CSV, validación,
     firmantes, fechas o notas.
     """
-    # Separamos el texto en líneas
-    lines = text.split("\n")
-    filtered_lines = []
-    
-    for line in lines:
-        # Si la línea incluye cualquiera de estas cadenas, la descartamos
-        if ( 
-            "CSV : GEN-" in line 
-            or "DIRECCIÓN DE VALIDACIÓN" in line 
-            or "FIRMANTE(" in line 
-            or "FECHA :" in line 
-            or "NOTAS :" in line
-        ):
-            continue
-        filtered_lines.append(line)
-    
-    # Unimos las líneas filtradas de nuevo en un solo texto
-    return "\n".join(filtered_lines)
+    # Una única sustitución sobre todo el texto, sin recorrer las líneas en Python
+    return SIGNATURE_LINE_RE.sub("", text)
 
 
 def extract_text_from_pdf(pdf_path: str) -> str:
@@ -72,37 +71,99 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     full_text = []
 
     for page in doc:
-        # Primero obtenemos el texto de la página
-        page_text = page.get_text("text")
+        # Construimos el TextPage una sola vez por página y lo consultamos directamente.
+        # PyMuPDF ya agrupa el texto en bloques (párrafos):
+        # (x0, y0, x1, y1, texto, nº de bloque, tipo de bloque)
+        textpage = page.get_textpage(flags=fitz.TEXTFLAGS_BLOCKS)
+        for block in textpage.extractBLOCKS():
+            block_text = block[4]
 
-        # Eliminamos las líneas que contengan firmas, CSV, etc.
-        page_text = remove_signature_lines(page_text)
+            # Ignoramos los bloques de imagen (tipo 1) y los vacíos
+            if block[6] != 0 or not block_text.strip():
+                continue
 
-        # Luego separamos por párrafos (doble salto de línea como heurística)
-        paragraphs = page_text.split("\n\n")
+            # Eliminamos las líneas que contengan firmas, CSV, etc.
+            block_text = remove_signature_lines(block_text)
 
-        # Limpiamos cada párrafo uniendo líneas
-        clean_paragraphs = [clean_paragraph(p) for p in paragraphs if p.strip()]
-        full_text.extend(clean_paragraphs)
+            # Limpiamos el bloque uniendo sus líneas
+            paragraph = clean_paragraph(block_text)
+            if paragraph:
+                full_text.append(paragraph)
 
     return "\n\n".join(full_text).strip()
 
 
-def process_all_pdfs():
+def _cache_path(pdf_path: str) -> str:
     """
-    Procesa todos los PDFs en INPUT_FOLDER y guarda la versión de texto limpio
-    en OUTPUT_FOLDER.
+    Ruta en CACHE_FOLDER del texto de pdf_path: blake2b de (ruta, mtime, tamaño),
+    de la versión de PyMuPDF y de EXTRACTION_VERSION. Basta un stat, sin leer el PDF.
+    El nombre empieza por un hash de la ruta, para encontrar las entradas antiguas del mismo PDF.
+    """
+    st = os.stat(pdf_path)
+    abspath = os.path.abspath(pdf_path)
+    key = f"{abspath}:{st.st_mtime_ns}:{st.st_size}:{fitz.VersionBind}:{EXTRACTION_VERSION}"
+    prefix = hashlib.blake2b(abspath.encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(CACHE_FOLDER, f"{prefix}-{hashlib.blake2b(key.encode('utf-8')).hexdigest()}.txt")
+
+
+def _prune_cache(cache_path: str) -> None:
+    """
+    Borra de CACHE_FOLDER las entradas anteriores del mismo PDF (mismo prefijo de ruta),
+    que han quedado obsoletas al cambiar el PDF o la extracción.
     """
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.lower().endswith(".pdf"):
-            input_path = os.path.join(INPUT_FOLDER, filename)
-            output_path = os.path.join(OUTPUT_FOLDER, filename.replace(".pdf", ".txt"))
+    name = os.path.basename(cache_path)
+    prefix = name.split("-", 1)[0] + "-"
+    with os.scandir(CACHE_FOLDER) as entries:
+        stale = [e.path for e in entries if e.name.startswith(prefix) and e.name != name]
+    for path in stale:
+        os.remove(path)
 
-            print(f"Extrayendo texto de {filename}...")
-            text = extract_text_from_pdf(input_path)
 
-            with open(output_path, "w", encoding="utf-8") as f:
+def _process_one(paths: tuple) -> None:
+    """
+    Extrae el texto de un único PDF y lo guarda en su .txt correspondiente.
+    Recibe una tupla (ruta_entrada, ruta_salida) para poder usarse con Pool.map.
+    """
+    input_path, output_path = paths
+    cache_path = _cache_path(input_path) if USE_CACHE else None
+
+    if cache_path and os.path.exists(cache_path):
+        print(f"Texto de {os.path.basename(input_path)} recuperado de la caché.")
+        with open(cache_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        print(f"Extrayendo texto de {os.path.basename(input_path)}...")
+        text = extract_text_from_pdf(input_path)
+        # No guardamos en caché los PDFs que no se han podido abrir
+        if cache_path and text:
+            with open(cache_path, "w", encoding="utf-8") as f:
                 f.write(text)
+            _prune_cache(cache_path)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def process_all_pdfs():
+    """
+    Procesa todos los PDFs en INPUT_FOLDER y guarda la versión de texto limpio
+    en OUTPUT_FOLDER. Cada PDF se procesa en un proceso distinto.
+    """
+    with os.scandir(INPUT_FOLDER) as entries:
+        all_paths = [
+            (
+                entry.path,
+                os.path.join(OUTPUT_FOLDER, entry.name.replace(".pdf", ".txt"))
+            )
+            for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(".pdf")
+        ]
+    if not all_paths:
+        return
+
+    workers = min(os.cpu_count() or 1, MAX_WORKERS, len(all_paths))
+    with multiprocessing.Pool(workers, maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+        pool.map(_process_one, all_paths)
 
 
 if __name__ == "__main__":
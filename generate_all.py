@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+import generate_summary_exp1
+import generate_summary_exp2
+import generate_summary_exp3
+import generate_summary_exp4
+from summary_common import load_parsed_jsons, write_summaries
+
+# Hilos que escriben los resúmenes a disco mientras el siguiente experimento usa la GPU
+IO_WORKERS = 2
+
+# Experimentos que se ejecutan sobre los mismos JSON, en este orden
+EXPERIMENTS = [
+    generate_summary_exp1,
+    generate_summary_exp2,
+    generate_summary_exp3,
+    generate_summary_exp4,
+]
+
+def process_all():
+    """
+    Ejecuta los cuatro experimentos en una sola pasada: cada JSON se carga una
+    única vez y los modelos compartidos (flan-t5 en exp1/exp2, BART en exp3/exp4)
+    permanecen cargados entre experimentos gracias a load_pipeline.
+    Las escrituras de un experimento se solapan con la generación del siguiente.
+    """
+    docs = load_parsed_jsons()
+    if not docs:
+        return
+
+    # Al salir del with se espera a que terminen todas las escrituras pendientes
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool:
+        for experiment in EXPERIMENTS:
+            print(f"\n[INFO] Ejecutando {experiment.__name__}...")
+            summaries = experiment.summarize(docs)
+            write_summaries(experiment.OUTPUT_FOLDER, docs, summaries, io_pool=io_pool)
+
+if __name__ == "__main__":
+    process_all()
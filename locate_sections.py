@@ -1,6 +1,6 @@
 import os
-import json
 import re
+import orjson
 
 INPUT_FOLDER = "data/extracted"
 OUTPUT_FOLDER = "data/sections"
@@ -17,6 +17,38 @@ SECTIONS = {
     "excelencia": ["EXCELENCIA", "EXCELENCIA ACADÉMICA", "CUANTÍA FIJA LIGADA A LA EXCELENCIA"]
 }
 
+# 2) Patrón con OR de todos los sinónimos de todas las secciones, compilado una sola vez.
+#    Si necesitas una regex avanzada para "artículo" (ej. r"artículo\s+\d+(\.)?") hazlo aparte
+SECTIONS_RE = re.compile(
+    "|".join(re.escape(title) for synonyms in SECTIONS.values() for title in synonyms),
+    flags=re.IGNORECASE
+)
+
+
+# Importes en euros: si el bloque de cuantías no tiene ninguno, se descarta
+EURO_RE = re.compile(r"€|euros", flags=re.IGNORECASE)
+
+
+def _section_for_heading(heading_lower: str):
+    """
+    Devuelve la primera sección (en el orden de SECTIONS) con algún sinónimo
+    contenido en heading_lower, o None si ninguna encaja.
+    """
+    for key, synonyms in SECTIONS.items():
+        for syn in synonyms:
+            if syn.lower() in heading_lower:
+                return key
+    return None
+
+
+# Sección de cada encabezado posible (en minúsculas), calculada una sola vez:
+# en el bucle de locate_sections basta con una búsqueda en el diccionario
+SYNONYM_TO_SECTION = {
+    syn.lower(): _section_for_heading(syn.lower())
+    for synonyms in SECTIONS.values()
+    for syn in synonyms
+}
+
 def locate_sections(text: str) -> dict:
     """
     Segmenta un texto según SECTIONS, unificando todo lo que pertenezca a una misma 
@@ -24,75 +56,61 @@ def locate_sections(text: str) -> dict:
     ["EXCELENCIA", "EXCELENCIA ACADÉMICA"], 
     se agrupará todo el contenido que esté bajo esos encabezados en found_sections["excelencia"].
     """
-    # Inicializamos el resultado: para cada sección, creamos un array con un único dict
-    # con "heading" y "content". 
-    found_sections = {}
-    for section_key in SECTIONS.keys():
-        found_sections[section_key] = [{
-            "heading": section_key,  # El "título" interno de la sección
-            "content": ""
-        }]
-
-    # 2) Construimos un patrón con OR de todos los sinónimos de todas las secciones
-    #    Si alguno de tus títulos contiene caracteres especiales, usa re.escape(t).
-    all_titles = []
-    for synonyms in SECTIONS.values():
-        all_titles.extend(synonyms)
-
-    # Si necesitas una regex avanzada para "artículo" (ej. r"artículo\s+\d+(\.)?") hazlo aparte
-    pattern = "|".join(all_titles)
+    # Bloques de texto de cada sección, que se unen una sola vez al final
+    section_parts = {section_key: [] for section_key in SECTIONS}
 
     # 3) Buscamos cada coincidencia (heading) en el texto con ignorecase
-    matches = list(re.finditer(pattern, text, flags=re.IGNORECASE))
-
-    for i, match in enumerate(matches):
-        start = match.start()
-        end = matches[i+1].start() if i+1 < len(matches) else len(text)
+    matches = list(SECTIONS_RE.finditer(text))
+    # Inicio de cada heading más el final del texto: cada bloque va de un inicio al siguiente
+    starts = [match.start() for match in matches] + [len(text)]
 
+    for match, start, end in zip(matches, starts, starts[1:]):
         # Bloque de texto desde este heading hasta el siguiente
         section_text = text[start:end].strip()
 
-        # Determinamos cuál de las SECTIONS encaja
-        heading_text = match.group(0)     # la subcadena exacta capturada
-        heading_lower = heading_text.lower()
-
-        # Recorremos SECTIONS para ver a cuál pertenece
-        for key, synonyms in SECTIONS.items():
-            for syn in synonyms:
-                if syn.lower() in heading_lower:
-                    # concatenamos
-                    found_sections[key][0]["content"] += "\n\n" + section_text
-                    break
-            else:
-                # si no rompemos, no coincide
-                continue
-            # si hemos roto, ya hallamos la sección
-            break
+        # Determinamos cuál de las SECTIONS encaja a partir de la subcadena exacta capturada
+        heading_lower = match.group(0).lower()
+        key = SYNONYM_TO_SECTION.get(heading_lower)
+        if key is None:
+            key = _section_for_heading(heading_lower)
+        if key is not None:
+            section_parts[key].append(section_text)
+
+    # Inicializamos el resultado: para cada sección, creamos un array con un único dict
+    # con "heading" y "content" (cada bloque va precedido de una línea en blanco)
+    found_sections = {}
+    for section_key, parts in section_parts.items():
+        found_sections[section_key] = [{
+            "heading": section_key,  # El "título" interno de la sección
+            "content": "".join("\n\n" + part for part in parts)
+        }]
 
     # Ejemplo adicional:
     # Si quieres filtrar "cuantias" si no contienen euros
-    content_lower = found_sections["cuantias"][0]["content"].lower()
-    if "€" not in content_lower and "euros" not in content_lower:
+    # (búsqueda sin distinguir mayúsculas, sin crear una copia en minúsculas del bloque)
+    if not EURO_RE.search(found_sections["cuantias"][0]["content"]):
         found_sections["cuantias"][0]["content"] = ""
 
     return found_sections
 
 def process_all_txts():
-    for filename in os.listdir(INPUT_FOLDER):
-        if filename.lower().endswith(".txt"):
-            input_path = os.path.join(INPUT_FOLDER, filename)
-            output_path = os.path.join(OUTPUT_FOLDER, filename.replace(".txt", ".json"))
+    with os.scandir(INPUT_FOLDER) as entries:
+        txt_entries = [e for e in entries if e.is_file() and e.name.lower().endswith(".txt")]
+
+    for entry in txt_entries:
+        output_path = os.path.join(OUTPUT_FOLDER, entry.name.replace(".txt", ".json"))
 
-            print(f"Extrayendo secciones de {filename}...")
-            with open(input_path, "r", encoding="utf-8") as f:
-                text = f.read()
+        print(f"Extrayendo secciones de {entry.name}...")
+        with open(entry.path, "r", encoding="utf-8") as f:
+            text = f.read()
 
-            sections = locate_sections(text)
+        sections = locate_sections(text)
 
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(sections, f, indent=2, ensure_ascii=False)
+        # orjson serializa directamente a UTF-8 y con la misma sangría que json.dump(indent=2)
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(sections, option=orjson.OPT_INDENT_2))
 
-            print(f"Secciones extraídas → {output_path}")
+        print(f"Secciones extraídas → {output_path}")
 
 
 if __name__ == "__main__":
@@ -1,31 +1,38 @@
-import os
+import extract_text
+import locate_sections
+import parse_sections
+import generate_all
 
-print("\n=== BOE Scholarship Summarizer ===")
+def main():
+    # Cada etapa se ejecuta en este mismo proceso: no se vuelve a arrancar el
+    # intérprete ni a importar torch/transformers una vez por script
+    print("\n=== BOE Scholarship Summarizer ===")
 
-# 1. EXTRAER TEXTO DE LOS PDFs
-print("\n[1/5] Extrayendo texto de los PDFs...")
-os.system("python extract_text.py")
+    # 1. EXTRAER TEXTO DE LOS PDFs
+    print("\n[1/5] Extrayendo texto de los PDFs...")
+    extract_text.process_all_pdfs()
 
-# 2. LOCALIZAR SECCIONES IMPORTANTES
-print("\n[2/5] Localizando secciones clave...")
-os.system("python locate_sections.py")
+    # 2. LOCALIZAR SECCIONES IMPORTANTES
+    print("\n[2/5] Localizando secciones clave...")
+    locate_sections.process_all_txts()
 
-# 3. PARSEAR INFORMACIÓN CLAVE
-print("\n[3/5] Parseando información...")
-os.system("python parse_sections.py")
+    # 3. PARSEAR INFORMACIÓN CLAVE
+    print("\n[3/5] Parseando información...")
+    parse_sections.main()
 
-# 4. GENERAR RESÚMENES INDIVIDUALES CON BERT
-print("\n[4/5] Generando resúmenes individuales...")
-os.system("python generate_summary_exp1.py")
-os.system("python generate_summary_exp2.py")
-os.system("python generate_summary_exp3.py")
-os.system("python generate_summary_exp4.py")
+    # 4. GENERAR RESÚMENES INDIVIDUALES CON BERT
+    print("\n[4/5] Generando resúmenes individuales...")
+    generate_all.process_all()
 
-print("\n=== PIPELINE COMPLETO ===")
-print("Todos los outputs están en:")
-print(" - data/extracted/")
-print(" - data/sections/")
-print(" - data/parsed/")
-print(" - data/summaries/")
+    print("\n=== PIPELINE COMPLETO ===")
+    print("Todos los outputs están en:")
+    print(" - data/extracted/")
+    print(" - data/sections/")
+    print(" - data/parsed/")
+    print(" - data/summaries/")
 
-print("\n¡Hecho!")
+    print("\n¡Hecho!")
+
+# El guard es necesario: extract_text usa un multiprocessing.Pool
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,82 @@
 import json
+import multiprocessing
 import re
 import os
+import orjson
+
+# Número máximo de procesos para parsear los JSON en paralelo
+MAX_WORKERS = 6
+# Por debajo de este número de ficheros se parsean en secuencia: cada uno tarda unos 15 ms
+# y arrancar el Pool cuesta más de lo que ahorra
+MIN_FILES_FOR_POOL = 32
+
+# Patrones compilados una sola vez al importar el módulo (se reutilizan en cada fichero)
+
+# Marcas de enumeración del tipo "1.º)": con re.split quedan [prefijo, marca, contenido, ...]
+BULLET_RE = re.compile(r'(\d{1,2}\.\s*º\))')
+# "Estudiantes de X...: 30 créditos..."
+TITLE_COLON_RE = re.compile(r'^(.*?)\:\s*(.*)$')
+
+# Solo se comprueba si hay coincidencia: "cubrir" ya cubre "cubrirá" y el resto del patrón
+# (texto e importe opcionales) siempre encajaba, así que no aportaba nada salvo backtracking
+MATRICULA_RE = re.compile(
+    r"beca de matrícula.*?cubrir",
+    flags=re.IGNORECASE|re.DOTALL
+)
+RENTA_RE = re.compile(
+    r"cuantía fija ligada a la renta.*?(\d[\d\.,]+)\s*(euros|€)",
+    flags=re.IGNORECASE
+)
+RESIDENCIA_RE = re.compile(
+    r"cuantía fija ligada a la residencia.*?(\d[\d\.,]+)\s*(euros|€)",
+    flags=re.IGNORECASE
+)
+BASICA_FP_RE = re.compile(
+    r"Beca básica:\s*(\d[\d\.,]+)\s*(?:euros|€).*?esta\s*cuantía\s*será\s*de\s*(\d[\d\.,]+)\s*(?:euros|€)",
+    flags=re.IGNORECASE|re.DOTALL
+)
+BASICA_RE = re.compile(
+    r"Beca básica:\s*(\d[\d\.,]+)\s*(?:euros|€)",
+    flags=re.IGNORECASE
+)
+VARIABLE_RE = re.compile(
+    r"cuantía variable.*?(?:importe mínimo.*?)(\d[\d\.,]+)\s*(euros|€)",
+    flags=re.IGNORECASE|re.DOTALL
+)
+# Porcentajes de créditos por rama: cada alternativa es un grupo con nombre (la clave en el
+# resultado), en el mismo orden de prioridad que la alternancia original. La rama es la de
+# la alternativa que encaja: un "Ingeniería o Arquitectura ... técnicas" cuenta como
+# ingeniería aunque el texto intermedio mencione otra rama (p. ej. "salud")
+RAMAS = {
+    "artes_humanidades": r"Artes y Humanidades",
+    "ciencias_sociales_juridicas": r"Ciencias Sociales y Jurídicas",
+    "ciencias_de_la_salud": r"Ciencias de la Salud",
+    "ingenieria_arquitectura_tecnicas": r"Ingeniería o Arquitectura[/\w\s]*técnicas",
+    "ciencias": r"Ciencias",
+}
+RAMAS_RE = re.compile(
+    "(?:" + "|".join(f"(?P<{key}>{pattern})" for key, pattern in RAMAS.items()) + r").*?(?P<porcentaje>\d{1,3})\%",
+    flags=re.IGNORECASE
+)
+
+NOTA_MINIMA_RE = re.compile(
+    r"se\s+requerirá.*?(\d[\d\.,]+)\s*(?:puntos|o superior)",
+    flags=re.IGNORECASE
+)
+EXCELENCIA_RE = re.compile(
+    r"excelencia\s+académica:\s*entre\s+(\d[\d\.,]+)\s+y\s+(\d[\d\.,]+)\s+euros",
+    flags=re.IGNORECASE
+)
+
+PLAZO_RE = re.compile(
+    r"(?:plazo.*?hasta\s+el\s+(\d{1,2}\s+de\s+\w+\s+de\s+\d{4}))",
+    flags=re.IGNORECASE
+)
+
+DONDE_PRESENTAR_RE = re.compile(
+    r"(solicitudes?\sse\spresentarán.*?\.)",
+    flags=re.IGNORECASE
+)
 
 def parse_requisitos(text: str) -> dict:
     """
@@ -20,15 +96,11 @@ def parse_requisitos(text: str) -> dict:
         "matriculacion_minima": {}
     }
 
-    # Patrón para capturar enumeraciones del tipo "1.º)" y su contenido
-    pattern_bullets = re.compile(
-        r'(?s)(\d{1,2}\.\s*º\))(.*?)(?=(\d{1,2}\.\s*º\))|$)',
-        flags=re.MULTILINE
-    )
-
-    for match in pattern_bullets.finditer(text):
-        bullet = match.group(1).strip()  # por ej. "1.º)"
-        content = match.group(2).strip()
+    parts = BULLET_RE.split(text)
+    for bullet, content in zip(parts[1::2], parts[2::2]):
+        bullet = bullet.strip()  # por ej. "1.º)"
+        # El contenido llega hasta la siguiente marca o, como mucho, hasta el final de la línea
+        content = content.split("\n", 1)[0].strip()
 
         # Eliminamos saltos de línea y dividimos
         lines = content.splitlines()
@@ -37,8 +109,7 @@ def parse_requisitos(text: str) -> dict:
             continue
 
         first_line = lines[0].strip()
-        # Patrón para "Estudiantes de X...: 30 créditos..."
-        colonmatch = re.match(r'^(.*?)\:\s*(.*)$', first_line)
+        colonmatch = TITLE_COLON_RE.match(first_line)
 
         if colonmatch:
             title = colonmatch.group(1).strip()
@@ -73,68 +144,35 @@ def parse_cuantias(text: str) -> dict:
         "porcentajes_por_rama": {}
     }
 
-    match_matricula = re.search(
-        r"beca de matrícula.*?(cubrirá|cubrir)(.*?)(\d[\d\.,]*\s*(€|euros))?",
-        text, flags=re.IGNORECASE|re.DOTALL
-    )
+    match_matricula = MATRICULA_RE.search(text)
     if match_matricula:
         results["beca_matricula"] = "Gratuidad de los créditos de primera matrícula"
 
-    match_renta = re.search(
-        r"cuantía fija ligada a la renta.*?(\d[\d\.,]+)\s*(euros|€)",
-        text, flags=re.IGNORECASE
-    )
+    match_renta = RENTA_RE.search(text)
     if match_renta:
         results["fija_renta"] = match_renta.group(1).replace(".", "")
 
-    match_residencia = re.search(
-        r"cuantía fija ligada a la residencia.*?(\d[\d\.,]+)\s*(euros|€)",
-        text, flags=re.IGNORECASE
-    )
+    match_residencia = RESIDENCIA_RE.search(text)
     if match_residencia:
         results["fija_residencia"] = match_residencia.group(1).replace(".", "")
 
-    block_basica = re.search(
-        r"Beca básica:\s*(\d[\d\.,]+)\s*(?:euros|€).*?esta\s*cuantía\s*será\s*de\s*(\d[\d\.,]+)\s*(?:euros|€)",
-        text, flags=re.IGNORECASE|re.DOTALL
-    )
+    block_basica = BASICA_FP_RE.search(text)
     if block_basica:
         results["beca_basica_normal"] = block_basica.group(1)
         results["beca_basica_fp_basico"] = block_basica.group(2)
     else:
-        solo_basica = re.search(
-            r"Beca básica:\s*(\d[\d\.,]+)\s*(?:euros|€)",
-            text, flags=re.IGNORECASE
-        )
+        solo_basica = BASICA_RE.search(text)
         if solo_basica:
             results["beca_basica_normal"] = solo_basica.group(1)
 
-    match_variable = re.search(
-        r"cuantía variable.*?(?:importe mínimo.*?)(\d[\d\.,]+)\s*(euros|€)",
-        text, flags=re.IGNORECASE|re.DOTALL
-    )
+    match_variable = VARIABLE_RE.search(text)
     if match_variable:
         results["variable_minima"] = match_variable.group(1)
 
-    # Porcentajes de créditos por rama
-    patron_ramas = re.compile(
-        r"(Artes y Humanidades|Ciencias Sociales y Jurídicas|Ciencias de la Salud|Ingeniería o Arquitectura[/\w\s]*técnicas|Ciencias).*?(\d{1,3})\%",
-        flags=re.IGNORECASE
-    )
-    for (rama_raw, porc_str) in patron_ramas.findall(text):
-        porc_int = int(porc_str)
-        rama_lower = rama_raw.lower()
-
-        if "artes y humanidades" in rama_lower:
-            results["porcentajes_por_rama"]["artes_humanidades"] = porc_int
-        elif "sociales y jurídicas" in rama_lower:
-            results["porcentajes_por_rama"]["ciencias_sociales_juridicas"] = porc_int
-        elif "salud" in rama_lower:
-            results["porcentajes_por_rama"]["ciencias_de_la_salud"] = porc_int
-        elif "ingeniería" in rama_lower or "arquitectura" in rama_lower:
-            results["porcentajes_por_rama"]["ingenieria_arquitectura_tecnicas"] = porc_int
-        elif "ciencias" in rama_lower:
-            results["porcentajes_por_rama"]["ciencias"] = porc_int
+    # Porcentajes de créditos por rama: el grupo que ha encajado identifica directamente la rama
+    for match in RAMAS_RE.finditer(text):
+        rama = next(key for key in RAMAS if match.group(key) is not None)
+        results["porcentajes_por_rama"][rama] = int(match.group("porcentaje"))
 
     return results
 
@@ -146,17 +184,11 @@ def parse_excelencia(text: str) -> dict:
         "excelencia_cuantia_max": None
     }
 
-    m_nota_min = re.search(
-        r"se\s+requerirá.*?(\d[\d\.,]+)\s*(?:puntos|o superior)",
-        text, flags=re.IGNORECASE
-    )
+    m_nota_min = NOTA_MINIMA_RE.search(text)
     if m_nota_min:
         results["nota_minima_excelencia"] = m_nota_min.group(1)
 
-    m_ex = re.search(
-        r"excelencia\s+académica:\s*entre\s+(\d[\d\.,]+)\s+y\s+(\d[\d\.,]+)\s+euros",
-        text, flags=re.IGNORECASE
-    )
+    m_ex = EXCELENCIA_RE.search(text)
     if m_ex:
         results["excelencia_cuantia_min"] = m_ex.group(1).replace('.', '').replace(',', '')
         results["excelencia_cuantia_max"] = m_ex.group(2).replace('.', '').replace(',', '')
@@ -168,10 +200,7 @@ def parse_plazo(text: str) -> dict:
     results = {
         "plazo_presentacion_fin": None
     }
-    match = re.search(
-        r"(?:plazo.*?hasta\s+el\s+(\d{1,2}\s+de\s+\w+\s+de\s+\d{4}))",
-        text, flags=re.IGNORECASE
-    )
+    match = PLAZO_RE.search(text)
     if match:
         results["plazo_presentacion_fin"] = match.group(1)
     return results
@@ -181,65 +210,83 @@ def parse_solicitud(text: str) -> dict:
     result = {
         "donde_presentar": None
     }
-    match_donde = re.search(
-        r"(solicitudes?\sse\spresentarán.*?\.)",
-        text, flags=re.IGNORECASE
-    )
+    match_donde = DONDE_PRESENTAR_RE.search(text)
     if match_donde:
         result["donde_presentar"] = match_donde.group(1).strip()
     return result
 
 
+def _process_one(paths: tuple) -> None:
+    """
+    Parsea las secciones de un único JSON y guarda el resultado.
+    Recibe una tupla (ruta_entrada, ruta_salida) para poder usarse con Pool.map.
+    """
+    input_path, output_path = paths
+    filename = os.path.basename(input_path)
+    print(f"[Parseando información...] Procesando {filename}")
+
+    # Cargamos la sección
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Extraemos el texto de cada sección
+    req_text  = data.get("requisitos",[{"content":""}])[0]["content"]
+    cuan_text = data.get("cuantias",[{"content":""}])[0]["content"]
+    plazo_text= data.get("plazo",[{"content":""}])[0]["content"]
+    sol_text  = data.get("solicitud",[{"content":""}])[0]["content"]
+    ex_text   = data.get("excelencia",[{"content":""}])[0]["content"]
+
+    # Parseamos cada parte
+    req_parsed   = parse_requisitos(req_text)
+    cuan_parsed  = parse_cuantias(cuan_text)
+    plazo_parsed = parse_plazo(plazo_text)
+    sol_parsed   = parse_solicitud(sol_text)
+    ex_parsed    = parse_excelencia(ex_text)
+
+    # Construimos el dict final
+    final_info = {
+        "requisitos": req_parsed,
+        "cuantias": cuan_parsed,
+        "excelencia": ex_parsed,
+        "plazo": plazo_parsed,
+        "solicitud": sol_parsed
+    }
+
+    # Movemos 'porcentajes_por_rama' desde cuantias a requisitos
+    por_rama = final_info["cuantias"].pop("porcentajes_por_rama", None)
+    if por_rama:
+        final_info["requisitos"]["porcentajes_por_rama"] = por_rama
+
+    # Guardamos en JSON final
+    with open(output_path, "wb") as out:
+        out.write(orjson.dumps(final_info, option=orjson.OPT_INDENT_2))
+
+    print(f"Archivo parseado guardado en: {output_path}")
+
+
 def main():
     input_folder = "data/sections"
     output_folder = "data/parsed"
     os.makedirs(output_folder, exist_ok=True)
 
-    for filename in os.listdir(input_folder):
-        if not filename.lower().endswith(".json"):
-            continue
-
-        input_path = os.path.join(input_folder, filename)
-        output_path = os.path.join(output_folder, filename)
-        print(f"[Parseando información...] Procesando {filename}")
-
-        # Cargamos la sección
-        with open(input_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Extraemos el texto de cada sección
-        req_text  = data.get("requisitos",[{"content":""}])[0]["content"]
-        cuan_text = data.get("cuantias",[{"content":""}])[0]["content"]
-        plazo_text= data.get("plazo",[{"content":""}])[0]["content"]
-        sol_text  = data.get("solicitud",[{"content":""}])[0]["content"]
-        ex_text   = data.get("excelencia",[{"content":""}])[0]["content"]
-
-        # Parseamos cada parte
-        req_parsed   = parse_requisitos(req_text)
-        cuan_parsed  = parse_cuantias(cuan_text)
-        plazo_parsed = parse_plazo(plazo_text)
-        sol_parsed   = parse_solicitud(sol_text)
-        ex_parsed    = parse_excelencia(ex_text)
-
-        # Construimos el dict final
-        final_info = {
-            "requisitos": req_parsed,
-            "cuantias": cuan_parsed,
-            "excelencia": ex_parsed,
-            "plazo": plazo_parsed,
-            "solicitud": sol_parsed
-        }
-
-        # Movemos 'porcentajes_por_rama' desde cuantias a requisitos
-        por_rama = final_info["cuantias"].pop("porcentajes_por_rama", None)
-        if por_rama:
-            final_info["requisitos"]["porcentajes_por_rama"] = por_rama
-
-        # Guardamos en JSON final
-        with open(output_path, "w", encoding="utf-8") as out:
-            json.dump(final_info, out, indent=2, ensure_ascii=False)
-
-        print(f"Archivo parseado guardado en: {output_path}")
+    with os.scandir(input_folder) as entries:
+        all_paths = [
+            (entry.path, os.path.join(output_folder, entry.name))
+            for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(".json")
+        ]
+    if not all_paths:
+        return
+
+    if len(all_paths) < MIN_FILES_FOR_POOL:
+        for paths in all_paths:
+            _process_one(paths)
+        return
+
+    # Cada fichero es independiente: se reparten entre varios procesos
+    workers = min(os.cpu_count() or 1, MAX_WORKERS, len(all_paths))
+    with multiprocessing.Pool(workers) as pool:
+        pool.map(_process_one, all_paths)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,395 @@
+import os
+import json
+import hashlib
+import time
+from functools import lru_cache
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, BitsAndBytesConfig, pipeline
+
+# Carpeta de entrada (JSON parseados) compartida por todos los experimentos
+INPUT_FOLDER = "data/parsed"
+
+# Los modelos se cargan en GPU y en bfloat16 (los de QUANTIZED_MODELS, en int8 si USE_INT8)
+DEVICE = 0                  # Cambiar a -1 si no se dispone de GPU
+TORCH_DTYPE = torch.bfloat16
+# Compilar el forward de cada modelo con torch.compile (solo tiene sentido en GPU).
+# Desactivado por defecto: generate() usa una caché KV dinámica, así que cada forma nueva
+# de (lote, longitud) exige trazar de nuevo, y no se ha medido una mejora con estos modelos
+USE_TORCH_COMPILE = False
+# Entrada de calentamiento de longitud parecida a los prompts reales
+WARMUP_INPUTS = ["Texto de calentamiento para el modelo. " * 40] * 4
+
+if DEVICE >= 0:
+    # TF32 en las matmul que queden en fp32 y selección automática de kernels de cuDNN
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
+
+# Cuantización a int8 con bitsandbytes de los modelos grandes (requiere GPU). Reduce a la
+# mitad la memoria de los pesos, pero la multiplicación en precisión mixta de LLM.int8
+# suele decodificar más despacio que bfloat16 en modelos de este tamaño: solo compensa
+# si el modelo no cabe en la VRAM disponible
+USE_INT8 = False
+QUANTIZED_MODELS = {"google/flan-t5-large", "facebook/bart-large-cnn"}
+
+# Caché en disco de las salidas de los pipelines: en ejecuciones posteriores sobre los
+# mismos JSON no se vuelve a generar nada (borrar la carpeta para forzar la regeneración)
+CACHE_FOLDER = "data/.cache/pipelines"
+USE_CACHE = True
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+
+# Ajuste automático del batch_size de cada pipeline (solo en GPU): se mide el rendimiento
+# con cada candidato sobre los propios textos a generar y se usa el mejor; el batch_size de
+# cada experimento queda como valor por defecto si el ajuste está desactivado
+AUTOTUNE_BATCH_SIZE = True
+BATCH_SIZE_CANDIDATES = (1, 4, 8, 16, 32, 64)
+
+# Límites de tokens nuevos que se generan por lote (max_length contaba la secuencia total)
+MIN_NEW_TOKENS = 64
+MAX_NEW_TOKENS = 256
+
+# Tabla para sustituir guiones bajos por espacios en las claves del resumen narrativo
+UNDERSCORE_TO_SPACE = str.maketrans("_", " ")
+
+
+def load_parsed_jsons() -> list:
+    """
+    Carga una única vez todos los JSON de INPUT_FOLDER.
+    Devuelve una lista de tuplas (filename, parsed) que pueden reutilizar
+    todos los experimentos sin volver a leer el disco.
+    """
+    with os.scandir(INPUT_FOLDER) as entries:
+        json_entries = [e for e in entries if e.is_file() and e.name.endswith(".json")]
+
+    docs = []
+    for entry in json_entries:
+        filename = entry.name
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                parsed = json.load(f)
+            print(f"[DEBUG] {filename}: JSON cargado exitosamente.")
+        except Exception as e:
+            print(f"[ERROR] {filename}: Error al cargar el JSON: {e}")
+            continue
+
+        docs.append((filename, parsed))
+    return docs
+
+
+@lru_cache(maxsize=None)
+def load_pipeline(task: str, model: str):
+    """
+    Construye el pipeline de HuggingFace para (task, model) una sola vez por proceso.
+    Los experimentos que usan el mismo modelo comparten así los pesos ya cargados;
+    los parámetros de generación se pasan en cada llamada, no aquí.
+    """
+    if USE_INT8 and model in QUANTIZED_MODELS and DEVICE >= 0:
+        # Pesos en int8: menos VRAM a cambio de una decodificación algo más lenta
+        quantized_model = AutoModelForSeq2SeqLM.from_pretrained(
+            model,
+            quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+            device_map="auto"
+        )
+        # bitsandbytes ya coloca el modelo en GPU y no se combina bien con torch.compile
+        pipe = pipeline(
+            task,
+            model=quantized_model,
+            tokenizer=AutoTokenizer.from_pretrained(model)
+        )
+        _warmup(pipe)
+        return pipe
+
+    pipe = pipeline(
+        task,
+        model=model,
+        torch_dtype=TORCH_DTYPE,
+        device=DEVICE
+    )
+
+    if USE_TORCH_COMPILE and DEVICE >= 0:
+        # Compilamos el forward (no el módulo) porque generate() llama a self.forward;
+        # la atención ya usa SDPA por defecto en los modelos que la soportan.
+        # Modo por defecto con formas dinámicas: "reduce-overhead" grabaría un CUDA graph
+        # por cada forma de lote y longitud que produce la ordenación por longitud.
+        pipe.model.forward = torch.compile(pipe.model.forward, dynamic=True)
+
+    if DEVICE >= 0:
+        _warmup(pipe)
+    return pipe
+
+
+def _warmup(pipe) -> None:
+    """
+    Llamada de calentamiento con un lote representativo: paga la compilación, la
+    inicialización de kernels CUDA y del allocator antes de procesar los documentos.
+    """
+    try:
+        pipe(WARMUP_INPUTS, batch_size=len(WARMUP_INPUTS), max_new_tokens=8, truncation=True)
+    except Exception as e:
+        print(f"[ERROR] {pipe.task}: Error en la llamada de calentamiento: {e}")
+
+
+def run_pipeline(pipe, inputs: list, **kwargs) -> list:
+    """
+    Ejecuta pipe sobre inputs reutilizando las salidas guardadas en CACHE_FOLDER.
+    Solo se envían al modelo los textos sin salida en caché (ordenados por longitud
+    con run_sorted_by_length), y sus resultados se guardan para la próxima vez.
+    Los textos cuya generación falla quedan como None (ver run_with_fallback).
+    """
+    if not USE_CACHE:
+        return run_with_fallback(pipe, inputs, **kwargs)
+
+    cache_paths = [os.path.join(CACHE_FOLDER, _cache_key(pipe, text, kwargs) + ".json") for text in inputs]
+    outputs = [None] * len(inputs)
+    missing = []
+    for i, cache_path in enumerate(cache_paths):
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                outputs[i] = json.load(f)
+        else:
+            missing.append(i)
+
+    print(f"[DEBUG] {pipe.task}: {len(inputs) - len(missing)} salidas en caché, {len(missing)} por generar.")
+    if missing:
+        new_outputs = run_with_fallback(pipe, [inputs[i] for i in missing], **kwargs)
+        for i, out in zip(missing, new_outputs):
+            outputs[i] = out
+            if out is None:
+                continue  # Se reintentará en la próxima ejecución
+            with open(cache_paths[i], "w", encoding="utf-8") as f:
+                json.dump(out, f, ensure_ascii=False)
+    return outputs
+
+
+def _cache_key(pipe, text: str, kwargs: dict) -> str:
+    # La clave incluye el dtype (int8/bf16 generan textos distintos) y solo depende del
+    # propio texto y de sus kwargs de generación (max_new_tokens es el de ese texto, ver
+    # run_pipeline_by_budget); batch_size no cambia el resultado, así que no forma parte de ella
+    generation_kwargs = {k: v for k, v in kwargs.items() if k != "batch_size"}
+    key = json.dumps(
+        [pipe.task, pipe.model.name_or_path, str(pipe.model.dtype), text, generation_kwargs],
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def run_with_fallback(pipe, inputs: list, **kwargs) -> list:
+    """
+    Ejecuta pipe sobre inputs en lotes con run_sorted_by_length. Si el lote falla
+    (una entrada problemática, falta de memoria...), reintenta cada texto por separado;
+    los que vuelven a fallar quedan como None, y el resto conserva su salida.
+    """
+    try:
+        return run_sorted_by_length(pipe, inputs, **kwargs)
+    except Exception as e:
+        print(f"[ERROR] {pipe.task}: Error en la generación por lotes, se reintenta texto a texto: {e}")
+    if DEVICE >= 0:
+        torch.cuda.empty_cache()
+
+    outputs = []
+    for text in inputs:
+        try:
+            outputs.append(pipe([text], **{**kwargs, "batch_size": 1})[0])
+        except Exception as e:
+            print(f"[ERROR] {pipe.task}: Error en la generación: {e}")
+            outputs.append(None)
+    return outputs
+
+
+def output_texts(docs: list, outputs: list, key: str, fallbacks: list, error_message: str) -> list:
+    """
+    Extrae out[key] de cada salida de run_pipeline. Para los documentos cuya generación
+    ha fallado (salida None) se muestra error_message y se usa su texto de fallbacks.
+    """
+    texts = []
+    for (filename, _), out, fallback in zip(docs, outputs, fallbacks):
+        if out is None:
+            print(f"[ERROR] {filename}: {error_message}")
+            texts.append(fallback)
+        else:
+            texts.append(out[key].strip())
+    return texts
+
+
+def run_sorted_by_length(pipe, inputs: list, **kwargs) -> list:
+    """
+    Llama a pipe con los inputs ordenados por número de tokens (de mayor a menor),
+    de modo que cada lote agrupa textos de longitud parecida y apenas lleva padding.
+    Devuelve las salidas en el orden original de inputs.
+    """
+    lengths = [len(pipe.tokenizer.encode(text, add_special_tokens=False)) for text in inputs]
+    order = sorted(range(len(inputs)), key=lambda i: lengths[i], reverse=True)
+
+    sorted_inputs = [inputs[i] for i in order]
+    if "batch_size" in kwargs:
+        sorted_outputs = run_autotuned(pipe, sorted_inputs, **kwargs)
+    else:
+        sorted_outputs = pipe(sorted_inputs, **kwargs)
+
+    outputs = [None] * len(inputs)
+    for i, out in zip(order, sorted_outputs):
+        outputs[i] = out
+    return outputs
+
+
+# batch_size elegido para cada (task, modelo, kwargs de generación), para ajustarlo una sola vez
+_TUNED_BATCH_SIZES = {}
+
+
+def run_autotuned(pipe, inputs: list, batch_size: int, **kwargs) -> list:
+    """
+    Llama a pipe sobre inputs con el batch_size de mayor rendimiento para su (task, modelo,
+    kwargs de generación). La primera vez se ajusta con los propios textos: los primeros
+    lotes se generan con cada candidato de BATCH_SIZE_CANDIDATES, midiendo textos/s, y el
+    resto con el mejor, así que medir no repite trabajo. Si todos los textos caben en un
+    lote de batch_size no hay nada que ajustar, y fuera de GPU o con AUTOTUNE_BATCH_SIZE
+    desactivado se usa batch_size tal cual.
+    """
+    key = (pipe.task, pipe.model.name_or_path, json.dumps(kwargs, sort_keys=True))
+    if key in _TUNED_BATCH_SIZES:
+        return pipe(inputs, batch_size=_TUNED_BATCH_SIZES[key], **kwargs)
+    if not AUTOTUNE_BATCH_SIZE or DEVICE < 0 or len(inputs) <= batch_size:
+        return pipe(inputs, batch_size=batch_size, **kwargs)
+
+    outputs = []
+    best_size, best_throughput = batch_size, 0.0
+    for candidate in BATCH_SIZE_CANDIDATES:
+        probe = inputs[len(outputs):len(outputs) + candidate]
+        if len(probe) < candidate:
+            break  # No quedan textos para un lote completo de este tamaño
+        try:
+            start = time.perf_counter()
+            probe_outputs = pipe(probe, batch_size=candidate, **kwargs)
+            throughput = candidate / (time.perf_counter() - start)
+        except torch.cuda.OutOfMemoryError:
+            torch.cuda.empty_cache()
+            break
+        outputs.extend(probe_outputs)
+        print(f"[DEBUG] {pipe.task}: batch_size={candidate} -> {throughput:.1f} textos/s")
+
+        # El rendimiento crece con el lote hasta un máximo y después empeora
+        if throughput <= best_throughput:
+            break
+        best_size, best_throughput = candidate, throughput
+
+    print(f"[INFO] {pipe.task}: batch_size ajustado a {best_size}")
+    _TUNED_BATCH_SIZES[key] = best_size
+    if len(outputs) < len(inputs):
+        outputs.extend(pipe(inputs[len(outputs):], batch_size=best_size, **kwargs))
+    return outputs
+
+
+def new_tokens_for(prompt: str) -> int:
+    """
+    Calcula max_new_tokens a partir de la longitud del prompt
+    (unos 4 caracteres por token), acotado entre MIN_NEW_TOKENS y MAX_NEW_TOKENS.
+    """
+    return min(MAX_NEW_TOKENS, max(MIN_NEW_TOKENS, len(prompt) // 4))
+
+
+def run_pipeline_by_budget(pipe, inputs: list, budgets: list, **kwargs) -> list:
+    """
+    Como run_pipeline, pero con un max_new_tokens propio para cada texto (budgets).
+    Los textos con el mismo límite se generan en una misma llamada, de modo que el
+    resumen de un documento no depende de qué otros documentos se procesan con él.
+    """
+    groups = {}
+    for i, budget in enumerate(budgets):
+        groups.setdefault(budget, []).append(i)
+
+    outputs = [None] * len(inputs)
+    for budget, indices in groups.items():
+        group_outputs = run_pipeline(pipe, [inputs[i] for i in indices], max_new_tokens=budget, **kwargs)
+        for i, out in zip(indices, group_outputs):
+            outputs[i] = out
+    return outputs
+
+
+def generate_narrative_summary(parsed: dict) -> str:
+    """
+    Genera un resumen narrativo determinista a partir de los datos extraídos del JSON.
+    Como exp2, exp3 y exp4 parten del mismo resumen, se memoriza por el contenido
+    serializado del JSON (sin ordenar las claves, el orden afecta al texto).
+    """
+    return _cached_narrative_summary(json.dumps(parsed, ensure_ascii=False))
+
+
+@lru_cache(maxsize=256)
+def _cached_narrative_summary(parsed_json: str) -> str:
+    return _build_narrative_summary(json.loads(parsed_json))
+
+
+def _build_narrative_summary(parsed: dict) -> str:
+    """
+    Redacta uno o dos párrafos de forma natural, reemplazando guiones bajos por espacios
+    en las claves y usando el punto (.) como separador de oraciones.
+    """
+    fecha_limite = parsed.get("plazo", {}).get("plazo_presentacion_fin")
+    requisitos_minimos = parsed.get("requisitos", {}).get("matriculacion_minima", {})
+    porcentajes = parsed.get("requisitos", {}).get("porcentajes_por_rama", {})
+    cuantias = parsed.get("cuantias", {})
+    excelencia = parsed.get("excelencia", {})
+    presentacion = parsed.get("solicitud", {}).get("donde_presentar")
+
+    # Todas las oraciones van a un único buffer que se une una sola vez al final
+    tokens = []
+
+    # Fecha límite
+    if fecha_limite:
+        tokens.append(f"La convocatoria de beca establece que la fecha límite para presentar la solicitud es el {fecha_limite}.")
+    else:
+        tokens.append("La convocatoria no especifica una fecha límite para la presentación de la solicitud.")
+
+    # Requisitos
+    if requisitos_minimos:
+        tokens.append("Entre los requisitos se exige:")
+        tokens.extend(f"{k.translate(UNDERSCORE_TO_SPACE).title()} requiere {v}." for k, v in requisitos_minimos.items())
+
+    # Porcentajes mínimos
+    if porcentajes:
+        tokens.append("Asimismo, se establecen porcentajes mínimos por rama:")
+        tokens.extend(f"{rama.translate(UNDERSCORE_TO_SPACE).title()} con un mínimo de {porc}%." for rama, porc in porcentajes.items())
+
+    # Cuantías
+    if cuantias:
+        tokens.append("En términos económicos, la convocatoria dispone cuantías tales como")
+        tokens.extend(f"{clave.translate(UNDERSCORE_TO_SPACE).title()} de {valor}." for clave, valor in cuantias.items())
+
+    # Incentivos de excelencia
+    if excelencia:
+        tokens.append("Además, se contemplan incentivos de excelencia, por ejemplo,")
+        tokens.extend(f"{clave.translate(UNDERSCORE_TO_SPACE).title()} de {valor}." for clave, valor in excelencia.items())
+
+    # Presentación de la solicitud
+    if presentacion:
+        tokens.append(f"Los interesados deberán presentar la solicitud en: {presentacion}.")
+    else:
+        tokens.append("No se especifica el lugar para presentar la solicitud.")
+
+    summary_text = " ".join(tokens)
+    if summary_text.endswith(".."):
+        summary_text = summary_text[:-1]
+    return summary_text
+
+
+def write_summaries(output_folder: str, docs: list, summaries: list, io_pool=None) -> None:
+    """
+    Guarda cada resumen en output_folder como <nombre>_resumen.txt,
+    en el mismo orden en que vienen los documentos de load_parsed_jsons.
+    Si se pasa un ThreadPoolExecutor en io_pool, las escrituras se encolan en él
+    y la función vuelve sin esperar a que terminen.
+    """
+    for (filename, _), summary in zip(docs, summaries):
+        output_path = os.path.join(output_folder, filename.replace(".json", "_resumen.txt"))
+        if io_pool is None:
+            _write_summary(filename, output_path, summary)
+        else:
+            io_pool.submit(_write_summary, filename, output_path, summary)
+
+
+def _write_summary(filename: str, output_path: str, summary: str) -> None:
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            out.write(summary)
+        print(f"[INFO] {filename}: Resumen guardado en: {output_path}\n{'='*50}\n")
+    except Exception as e:
+        print(f"[ERROR] {filename}: Error al guardar el resumen: {e}")